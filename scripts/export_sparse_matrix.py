@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+"""
+YouTube Tagging Dataset (2006-2007) - Sparse Matrix Exporter
+Exports the video x tag relationships as a sparse matrix with stable
+vid_id/tag_id index maps and optional numeric video side features.
+
+Usage:
+    python export_sparse_matrix.py --db youtube_2006.db --output-dir data/matrix
+    python export_sparse_matrix.py --packed data/packed --casefold --min-tag-freq 5 --weighting tfidf --side-features
+"""
+
+import argparse
+import json
+import sqlite3
+import struct
+import zipfile
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+
+# Sibling module in scripts/; run from that directory or add it to sys.path
+from pack_jsonl import BlockJsonlReader
+
+
+WEIGHTINGS = ('count', 'binary', 'tfidf', 'bm25')
+
+SIDE_FEATURES = ('length_seconds', 'view_count', 'rating_avg', 'rating_count', 'upload_day')
+
+MATRIX_FILE = 'video_tag.npz'
+
+
+class DatasetSource:
+    """Reads table rows in chunks from an SQLite database or packed JSONL."""
+
+    def __init__(self, db_path=None, packed_dir=None, chunk_size=20000, workers=None):
+        if (db_path is None) == (packed_dir is None):
+            raise ValueError("Specify exactly one of db_path or packed_dir")
+        self.db_path = db_path
+        self.packed_dir = packed_dir
+        self.chunk_size = chunk_size
+        self.workers = workers
+
+    def count(self, table):
+        """Return the number of rows in ``table``."""
+        if self.db_path is not None:
+            conn = sqlite3.connect(self.db_path)
+            try:
+                return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            finally:
+                conn.close()
+
+        return len(BlockJsonlReader(self.packed_dir, table))
+
+    def iter_chunks(self, table, columns, order_by=None):
+        """Yield lists of row tuples with the requested columns.
+
+        ``order_by`` names a column the rows must arrive sorted by; packed
+        tables are only accepted if they were packed sorted on it.
+        """
+        if self.db_path is not None:
+            conn = sqlite3.connect(self.db_path)
+            try:
+                query = f"SELECT {', '.join(columns)} FROM {table}"
+                if order_by:
+                    query += f" ORDER BY {order_by}"
+                cursor = conn.execute(query)
+                while True:
+                    rows = cursor.fetchmany(self.chunk_size)
+                    if not rows:
+                        break
+                    yield rows
+            finally:
+                conn.close()
+            return
+
+        reader = BlockJsonlReader(self.packed_dir, table, workers=self.workers)
+        if order_by and (reader.key != order_by or not reader.index['sorted']):
+            raise ValueError(f"Packed table '{table}' is not sorted by {order_by}; "
+                             f"repack it without --no-sort")
+        # Re-chunk block-sized batches so chunk_size applies to packed input too
+        pending = []
+        for records in reader.iter_blocks():
+            pending.extend(tuple(record.get(column) for column in columns)
+                           for record in records)
+            while len(pending) >= self.chunk_size:
+                yield pending[:self.chunk_size]
+                del pending[:self.chunk_size]
+        if pending:
+            yield pending
+
+
+class SparseMatrixExporter:
+    """Builds the video x tag matrix in chunks with vectorized index mapping."""
+
+    def __init__(self, source, casefold=False, min_tag_freq=1, weighting='count',
+                 matrix_format='csr', bm25_k1=1.2, bm25_b=0.75):
+        if weighting not in WEIGHTINGS:
+            raise ValueError(f"Unknown weighting: {weighting}")
+        if matrix_format not in ('csr', 'csc'):
+            raise ValueError(f"Unknown matrix format: {matrix_format}")
+        self.source = source
+        self.casefold = casefold
+        self.min_tag_freq = min_tag_freq
+        self.weighting = weighting
+        self.matrix_format = matrix_format
+        self.bm25_k1 = bm25_k1
+        self.bm25_b = bm25_b
+
+    def build_video_index(self, side_features=False):
+        """Return sorted vid_ids and, optionally, aligned side features."""
+        columns = ('vid_id',) + (('length_seconds', 'view_count', 'rating_avg',
+                                  'rating_count', 'upload_time') if side_features else ())
+        vid_chunks = []
+        feature_chunks = []
+        for rows in self.source.iter_chunks('videos', columns):
+            vid_chunks.append(np.array([row[0] or '' for row in rows], dtype=str))
+            if side_features:
+                values = np.array([row[1:] for row in rows], dtype=np.float64)
+                feature_chunks.append(values)
+
+        vid_ids = np.concatenate(vid_chunks) if vid_chunks else np.array([], dtype=str)
+        # NULL vid_ids become '' here and in build_matrix; drop them so no pair matches
+        order = np.argsort(vid_ids, kind='stable')
+        order = order[vid_ids[order] != '']
+        vid_ids = vid_ids[order]
+
+        features = None
+        if side_features:
+            features = (np.concatenate(feature_chunks) if feature_chunks
+                        else np.empty((0, len(SIDE_FEATURES))))[order]
+            upload_time = features[:, 4]
+            upload_time[upload_time <= 0] = np.nan
+            features[:, 4] = np.floor(upload_time / 86400)  # Days since 1970-01-01
+
+        print(f"✓ Indexed {len(vid_ids):,} videos")
+        return vid_ids, features
+
+    def build_tag_index(self):
+        """Map tag_id to matrix columns, merging case variants if requested.
+
+        Returns a lookup array indexed by tag_id plus the per-column
+        representative tag_id (smallest in the group) and label.
+        """
+        id_chunks = []
+        label_chunks = []
+        for rows in self.source.iter_chunks('tags', ('tag_id', 'tag')):
+            id_chunks.append(np.array([row[0] for row in rows], dtype=np.int64))
+            labels = [row[1] or '' for row in rows]
+            if self.casefold:
+                labels = [label.casefold() for label in labels]
+            label_chunks.append(np.array(labels, dtype=str))
+
+        tag_ids = np.concatenate(id_chunks) if id_chunks else np.array([], dtype=np.int64)
+        labels = np.concatenate(label_chunks) if label_chunks else np.array([], dtype=str)
+
+        if self.casefold:
+            col_labels, columns = np.unique(labels, return_inverse=True)
+            col_tag_ids = np.full(len(col_labels), np.iinfo(np.int64).max, dtype=np.int64)
+            np.minimum.at(col_tag_ids, columns, tag_ids)
+        else:
+            order = np.argsort(tag_ids, kind='stable')
+            col_tag_ids = tag_ids[order]
+            col_labels = labels[order]
+            columns = np.empty(len(tag_ids), dtype=np.int64)
+            columns[order] = np.arange(len(tag_ids))
+
+        lookup = np.full(int(tag_ids.max()) + 1 if len(tag_ids) else 0, -1, dtype=np.int32)
+        lookup[tag_ids] = columns
+
+        print(f"✓ Indexed {len(tag_ids):,} tags into {len(col_labels):,} columns")
+        return lookup, col_tag_ids, col_labels
+
+    def build_matrix(self, vid_ids, tag_lookup, n_columns):
+        """Build the CSR count matrix directly from pairs read in vid_id order.
+
+        Rows arrive sorted, so column indices are appended into one
+        preallocated array and ``indptr`` comes from per-row counts; no
+        COO triplets are ever materialised.
+        """
+        n_rows = len(vid_ids)
+        indices = np.empty(self.source.count('video_tag_key'), dtype=np.int32)
+        row_counts = np.zeros(n_rows, dtype=np.int64)
+        filled = 0
+        last_row = -1
+        dropped = 0
+
+        for rows in self.source.iter_chunks('video_tag_key', ('vid_id', 'tag_id'),
+                                            order_by='vid_id'):
+            vids = np.array([row[0] or '' for row in rows], dtype=str)
+            tags = np.array([-1 if row[1] is None else row[1] for row in rows], dtype=np.int64)
+            del rows
+
+            row_idx = np.searchsorted(vid_ids, vids)
+            valid = row_idx < n_rows
+            valid[valid] = vid_ids[row_idx[valid]] == vids[valid]
+
+            in_range = (tags >= 0) & (tags < len(tag_lookup))
+            col_idx = np.full(len(tags), -1, dtype=np.int32)
+            col_idx[in_range] = tag_lookup[tags[in_range]]
+            valid &= col_idx >= 0
+
+            dropped += int((~valid).sum())
+            row_idx = row_idx[valid]
+            col_idx = col_idx[valid]
+            if not len(row_idx):
+                continue
+            if row_idx[0] < last_row or np.any(np.diff(row_idx) < 0):
+                raise ValueError("video_tag_key rows are not in vid_id order")
+            last_row = row_idx[-1]
+
+            unique_rows, counts = np.unique(row_idx, return_counts=True)
+            row_counts[unique_rows] += counts
+            indices[filled:filled + len(col_idx)] = col_idx
+            filled += len(col_idx)
+
+        indptr = np.zeros(n_rows + 1, dtype=np.int64 if filled > np.iinfo(np.int32).max
+                          else np.int32)
+        np.cumsum(row_counts, out=indptr[1:])
+        del row_counts
+
+        matrix = sparse.csr_matrix(
+            (np.ones(filled, dtype=np.float32), indices[:filled], indptr),
+            shape=(n_rows, n_columns), copy=False
+        )
+        # Sorts each row's columns in place; sums case-folded duplicates
+        matrix.sum_duplicates()
+        if self.casefold:
+            # Case variants on one video mean the tag is present once, not twice
+            matrix.data[:] = 1
+
+        if dropped:
+            print(f"⚠ Dropped {dropped:,} pairs referencing unknown videos or tags")
+        print(f"✓ Built matrix: {matrix.shape[0]:,} x {matrix.shape[1]:,}, "
+              f"{matrix.nnz:,} non-zeros")
+        return matrix
+
+    def apply_weighting(self, matrix):
+        """Reweight stored term counts in place."""
+        if self.weighting == 'count':
+            return matrix
+        if self.weighting == 'binary':
+            matrix.data[:] = 1
+            return matrix
+
+        n_docs = int(np.count_nonzero(np.diff(matrix.indptr)))
+        df = np.bincount(matrix.indices, minlength=matrix.shape[1]).astype(np.float64)
+        tf = matrix.data.astype(np.float64)
+
+        if self.weighting == 'tfidf':
+            idf = np.log((1 + n_docs) / (1 + df)) + 1
+            matrix.data = (tf * idf[matrix.indices]).astype(np.float32)
+            return matrix
+
+        # BM25 with the Lucene-style non-negative idf
+        idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        doc_len = np.asarray(matrix.sum(axis=1, dtype=np.float64)).ravel()
+        avg_len = doc_len.sum() / n_docs if n_docs else 1.0
+        entry_len = np.repeat(doc_len, np.diff(matrix.indptr))
+        k1, b = self.bm25_k1, self.bm25_b
+        norm = tf + k1 * (1 - b + b * entry_len / avg_len)
+        matrix.data = (idf[matrix.indices] * tf * (k1 + 1) / norm).astype(np.float32)
+        return matrix
+
+    def export(self, output_dir, side_features=False):
+        """Build the matrix and write it with its index maps to ``output_dir``."""
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        vid_ids, features = self.build_video_index(side_features)
+        tag_lookup, col_tag_ids, col_labels = self.build_tag_index()
+        matrix = self.build_matrix(vid_ids, tag_lookup, len(col_tag_ids))
+        del tag_lookup
+
+        if self.min_tag_freq > 1:
+            df = np.bincount(matrix.indices, minlength=matrix.shape[1])
+            keep = df >= self.min_tag_freq
+            matrix = matrix[:, np.flatnonzero(keep)]
+            col_tag_ids = col_tag_ids[keep]
+            col_labels = col_labels[keep]
+            print(f"✓ Kept {int(keep.sum()):,} tags used by >= {self.min_tag_freq} videos")
+
+        matrix = self.apply_weighting(matrix)
+        if self.matrix_format == 'csc':
+            matrix = matrix.tocsc()
+
+        # Uncompressed so load_export can memory-map the archive members
+        sparse.save_npz(output_dir / MATRIX_FILE, matrix, compressed=False)
+        np.save(output_dir / 'vid_ids.npy', vid_ids)
+        np.save(output_dir / 'tag_ids.npy', col_tag_ids)
+        np.save(output_dir / 'tag_labels.npy', col_labels)
+        if features is not None:
+            np.save(output_dir / 'video_features.npy', features)
+
+        manifest = {
+            'matrix': MATRIX_FILE,
+            'format': self.matrix_format,
+            'shape': list(matrix.shape),
+            'nnz': int(matrix.nnz),
+            'dtype': str(matrix.dtype),
+            'rows': 'vid_ids.npy',
+            'columns': {'tag_ids': 'tag_ids.npy', 'labels': 'tag_labels.npy'},
+            'casefold': self.casefold,
+            'min_tag_freq': self.min_tag_freq,
+            'weighting': self.weighting,
+            'side_features': list(SIDE_FEATURES) if features is not None else None,
+        }
+        if self.weighting == 'bm25':
+            manifest['bm25'] = {'k1': self.bm25_k1, 'b': self.bm25_b}
+        with open(output_dir / 'manifest.json', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+
+        print(f"\n✓ Matrix exported to: {output_dir}")
+        return manifest
+
+
+def _mmap_npz_member(path, name):
+    """Memory-map an uncompressed ``.npy`` member of an ``.npz`` archive.
+
+    Returns None if the member is compressed and so cannot be mapped.
+    """
+    with zipfile.ZipFile(path) as archive:
+        info = archive.getinfo(f"{name}.npy")
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+
+    with open(path, 'rb') as f:
+        # Local file header: 30 fixed bytes, then file name and extra field
+        f.seek(info.header_offset)
+        header = f.read(30)
+        name_length, extra_length = struct.unpack('<HH', header[26:30])
+        f.seek(info.header_offset + 30 + name_length + extra_length)
+
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+
+    if not shape or 0 in shape:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=shape, offset=offset,
+                     order='F' if fortran_order else 'C')
+
+
+def _load_matrix(path, mmap=True):
+    """Load a ``save_npz`` matrix, memory-mapping its arrays when possible."""
+    if mmap:
+        with np.load(path) as archive:
+            matrix_format = archive['format'].item()
+            if isinstance(matrix_format, bytes):
+                matrix_format = matrix_format.decode('ascii')
+            shape = tuple(archive['shape'])
+
+        arrays = [_mmap_npz_member(path, name) for name in ('data', 'indices', 'indptr')]
+        if matrix_format in ('csr', 'csc') and all(a is not None for a in arrays):
+            matrix_cls = sparse.csr_matrix if matrix_format == 'csr' else sparse.csc_matrix
+            return matrix_cls(tuple(arrays), shape=shape, copy=False)
+
+    return sparse.load_npz(path)
+
+
+def load_export(output_dir, mmap=True):
+    """Load an export; the matrix arrays, index maps and side features are
+    memory-mapped by default."""
+    output_dir = Path(output_dir)
+    with open(output_dir / 'manifest.json', 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    mmap_mode = 'r' if mmap else None
+    result = {
+        'manifest': manifest,
+        'matrix': _load_matrix(output_dir / manifest['matrix'], mmap=mmap),
+        'vid_ids': np.load(output_dir / manifest['rows'], mmap_mode=mmap_mode),
+        'tag_ids': np.load(output_dir / manifest['columns']['tag_ids'], mmap_mode=mmap_mode),
+        'tag_labels': np.load(output_dir / manifest['columns']['labels'], mmap_mode=mmap_mode),
+        'video_features': None,
+    }
+    if manifest['side_features']:
+        result['video_features'] = np.load(output_dir / 'video_features.npy',
+                                           mmap_mode=mmap_mode)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Export a sparse video x tag matrix for YouTube Tagging Dataset (2006-2007)'
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument(
+        '--db',
+        help='Path to SQLite database file'
+    )
+    source.add_argument(
+        '--packed',
+        help='Directory of block-compressed JSONL tables from pack_jsonl.py'
+    )
+    parser.add_argument(
+        '--output-dir',
+        default='data/matrix',
+        help='Output directory for the matrix, index maps and manifest'
+    )
+    parser.add_argument(
+        '--casefold',
+        action='store_true',
+        help='Merge tags that differ only by case into one column'
+    )
+    parser.add_argument(
+        '--min-tag-freq',
+        type=int,
+        default=1,
+        help='Drop tags used by fewer than this many videos'
+    )
+    parser.add_argument(
+        '--weighting',
+        choices=WEIGHTINGS,
+        default='count',
+        help='Cell weighting scheme'
+    )
+    parser.add_argument('--bm25-k1', type=float, default=1.2, help='BM25 k1 parameter')
+    parser.add_argument('--bm25-b', type=float, default=0.75, help='BM25 b parameter')
+    parser.add_argument(
+        '--format',
+        choices=['csr', 'csc'],
+        default='csr',
+        help='Sparse storage format'
+    )
+    parser.add_argument(
+        '--side-features',
+        action='store_true',
+        help='Also write video_features.npy (' + ', '.join(SIDE_FEATURES) + ')'
+    )
+    parser.add_argument(
+        '--chunk-size',
+        type=int,
+        default=20000,
+        help='Rows processed per chunk (SQLite fetches or re-chunked packed blocks)'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        help='Threads that decompress --packed blocks ahead of JSON parsing'
+    )
+
+    args = parser.parse_args()
+
+    source = DatasetSource(
+        db_path=args.db,
+        packed_dir=args.packed,
+        chunk_size=args.chunk_size,
+        workers=args.workers
+    )
+    exporter = SparseMatrixExporter(
+        source,
+        casefold=args.casefold,
+        min_tag_freq=args.min_tag_freq,
+        weighting=args.weighting,
+        matrix_format=args.format,
+        bm25_k1=args.bm25_k1,
+        bm25_b=args.bm25_b
+    )
+    exporter.export(args.output_dir, side_features=args.side_features)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,16 +5,22 @@ Generates comprehensive statistics and visualizations for the dataset landing pa
 
 Usage:
     python generate_statistics.py --db youtube_2006.db --output-dir docs/assets/images/visualizations
+    python generate_statistics.py --packed data/packed --output analysis/summary_statistics.json
 """
 
 import sqlite3
 import json
 import argparse
+import os
+import tempfile
 from datetime import datetime
 from collections import Counter
 import statistics
 from pathlib import Path
 
+# Sibling module in scripts/; run from that directory or add it to sys.path
+from pack_jsonl import load_into_sqlite
+
 
 class YouTubeDatasetAnalyzer:
     """Analyzes the YouTube 2006-2007 tagging dataset and generates statistics."""
@@ -24,6 +30,30 @@ class YouTubeDatasetAnalyzer:
         self.conn = sqlite3.connect(db_path)
         self.conn.row_factory = sqlite3.Row
         self.stats = {}
+        self._temp_db = None
+        
+    @classmethod
+    def from_packed(cls, packed_dir, workers=None, cache_db=None):
+        """Create an analyzer backed by block-compressed JSONL (see pack_jsonl.py).
+        
+        The tables are loaded into an on-disk SQLite file: ``cache_db`` if
+        given (reused on later runs), otherwise a temporary file removed on close.
+        """
+        if cache_db is None:
+            fd, db_path = tempfile.mkstemp(suffix='.db', prefix='youtube_packed_')
+            os.close(fd)
+        else:
+            db_path = cache_db
+        
+        analyzer = cls(db_path)
+        if cache_db is None:
+            analyzer._temp_db = db_path
+        try:
+            load_into_sqlite(analyzer.conn, packed_dir, workers=workers)
+        except Exception:
+            analyzer.close()
+            raise
+        return analyzer
         
     def get_basic_counts(self):
         """Get basic dataset counts."""
@@ -374,17 +404,33 @@ class YouTubeDatasetAnalyzer:
     def close(self):
         """Close database connection."""
         self.conn.close()
+        if self._temp_db:
+            os.remove(self._temp_db)
 
 
 def main():
     parser = argparse.ArgumentParser(
         description='Generate statistics for YouTube Tagging Dataset (2006-2007)'
     )
-    parser.add_argument(
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument(
         '--db',
-        required=True,
         help='Path to SQLite database file'
     )
+    source.add_argument(
+        '--packed',
+        help='Directory of block-compressed JSONL tables from pack_jsonl.py'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        help='Threads that decompress --packed blocks ahead of JSON parsing'
+    )
+    parser.add_argument(
+        '--cache-db',
+        help='SQLite file to load --packed tables into and reuse between runs '
+             '(default: temporary file)'
+    )
     parser.add_argument(
         '--output',
         default='analysis/summary_statistics.json',
@@ -394,7 +440,12 @@ def main():
     args = parser.parse_args()
     
     # Run analysis
-    analyzer = YouTubeDatasetAnalyzer(args.db)
+    if args.packed:
+        analyzer = YouTubeDatasetAnalyzer.from_packed(
+            args.packed, workers=args.workers, cache_db=args.cache_db
+        )
+    else:
+        analyzer = YouTubeDatasetAnalyzer(args.db)
     analyzer.run_all_analyses()
     analyzer.save_statistics(args.output)
     analyzer.close()
@@ -0,0 +1,544 @@
+#!/usr/bin/env python3
+"""
+YouTube Tagging Dataset (2006-2007) - Seekable JSONL Packer
+Packs the JSONL tables into independently compressed blocks with a sidecar
+index so they can be downloaded compressed, streamed in parallel and
+searched by key without decompressing the whole file.
+
+Usage:
+    python pack_jsonl.py --input-dir data/jsonl --output-dir data/packed
+    python pack_jsonl.py --lookup data/packed --table videos --key g7uoZT-KFK4
+"""
+
+import argparse
+import gzip
+import heapq
+import json
+import os
+import tempfile
+from bisect import bisect_left, bisect_right
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:  # Optional: fall back to gzip members
+    zstandard = None
+
+
+# Table name -> (index key field, sort key fields, columns)
+TABLES = {
+    'videos': ('vid_id', ('vid_id',), (
+        'vid_id', 'title', 'author', 'length_seconds', 'rating_avg',
+        'rating_count', 'description', 'view_count', 'upload_time',
+        'comment_count', 'url', 'thumbnail_url', 'created', 'modified'
+    )),
+    'tags': ('tag_id', ('tag_id',), (
+        'tag_id', 'tag', 'created', 'modified', 'looked_up'
+    )),
+    'video_tag_key': ('vid_id', ('vid_id', 'tag_id'), (
+        'vid_id', 'tag_id', 'created'
+    )),
+}
+
+# Table name -> {key field: (file infix, sort key fields)} for extra sorted copies
+ALTERNATE_ORDERS = {
+    'video_tag_key': {'tag_id': ('by_tag', ('tag_id', 'vid_id'))},
+}
+
+INDEX_SUFFIX = '.index.json'
+INDEX_VERSION = 3
+
+# Rough per-record cost of the key tuples and objects held during sorting
+RECORD_OVERHEAD = 256
+
+
+def _sort_value(value):
+    """Order NULL keys first without comparing None to str/int."""
+    return (value is not None, value)
+
+
+class BlockCodec:
+    """Compresses and decompresses single blocks (zstd frames or gzip members)."""
+
+    def __init__(self, codec, level=None):
+        if codec == 'zstd' and zstandard is None:
+            raise RuntimeError("zstd codec requires the 'zstandard' package "
+                               "(pip install zstandard)")
+        if codec not in ('zstd', 'gzip'):
+            raise ValueError(f"Unknown codec: {codec}")
+        self.codec = codec
+        self.level = level
+
+    @property
+    def extension(self):
+        return '.zst' if self.codec == 'zstd' else '.gz'
+
+    def compress(self, data):
+        if self.codec == 'zstd':
+            level = 10 if self.level is None else self.level
+            return zstandard.ZstdCompressor(level=level).compress(data)
+        level = 6 if self.level is None else self.level
+        return gzip.compress(data, compresslevel=level, mtime=0)
+
+    def decompress(self, data):
+        if self.codec == 'zstd':
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+
+
+class BlockPacker:
+    """Writes one JSONL table as a block-compressed file plus sidecar index."""
+
+    def __init__(self, codec='zstd', level=None, block_records=50000,
+                 sort=True, sort_memory=256 * 1024 * 1024):
+        self.codec = BlockCodec(codec, level)
+        self.block_records = block_records
+        self.sort = sort
+        self.sort_memory = sort_memory
+
+    def pack_table(self, table, input_path, output_dir):
+        """Pack ``input_path`` and return the index dictionary.
+
+        Sorted packs also get one extra copy per entry in ``ALTERNATE_ORDERS``
+        (e.g. ``video_tag_key.by_tag.jsonl.zst``) so that key can be bisected too.
+        """
+        key_field, sort_fields, _ = TABLES[table]
+        index = self._write_pack(table, key_field, sort_fields, input_path, output_dir)
+
+        if self.sort:
+            for alt_key, (infix, alt_fields) in ALTERNATE_ORDERS.get(table, {}).items():
+                self._write_pack(f"{table}.{infix}", alt_key, alt_fields,
+                                 input_path, output_dir)
+        return index
+
+    def _write_pack(self, name, key_field, sort_fields, input_path, output_dir):
+        """Write ``<name>.jsonl<ext>`` sorted by ``sort_fields`` plus its index."""
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        output_path = output_dir / f"{name}.jsonl{self.codec.extension}"
+
+        # Remove a pack of this table written with the other codec so readers
+        # never pick up stale data
+        for stale in output_dir.glob(f"{name}.jsonl.*"):
+            if stale.name not in (output_path.name, output_path.name + INDEX_SUFFIX):
+                stale.unlink()
+
+        def sort_key(item):
+            return item[0]
+
+        with tempfile.TemporaryDirectory(dir=output_dir) as tmp_dir:
+            records = self._keyed_lines(input_path, sort_fields)
+            if self.sort:
+                records = self._external_sort(records, sort_key, tmp_dir)
+
+            blocks = []
+            total_records = 0
+            uncompressed_bytes = 0
+            offset = 0
+            with open(output_path, 'wb') as out:
+                for block in self._chunk(records):
+                    payload = b''.join(line for _, line in block)
+                    compressed = self.codec.compress(payload)
+                    out.write(compressed)
+
+                    keys = [k[0] for k, _ in block]
+                    blocks.append({
+                        'offset': offset,
+                        'length': len(compressed),
+                        'records': len(block),
+                        'first_key': keys[0][1],
+                        'last_key': keys[-1][1],
+                        'min_key': min(keys)[1],
+                        'max_key': max(keys)[1],
+                    })
+                    offset += len(compressed)
+                    total_records += len(block)
+                    uncompressed_bytes += len(payload)
+
+        index = {
+            'version': INDEX_VERSION,
+            'table': name,
+            'file': output_path.name,
+            'codec': self.codec.codec,
+            'key': key_field,
+            'sorted': self.sort,
+            'records': total_records,
+            'uncompressed_bytes': uncompressed_bytes,
+            'compressed_bytes': offset,
+            'blocks': blocks,
+        }
+        index_path = output_dir / (output_path.name + INDEX_SUFFIX)
+        with open(index_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+
+        ratio = uncompressed_bytes / offset if offset else 0
+        print(f"✓ Packed {name}: {total_records:,} records in {len(blocks):,} "
+              f"blocks ({ratio:.1f}x smaller)")
+        return index
+
+    def _keyed_lines(self, input_path, sort_fields):
+        """Yield ``(sort_key, line)`` for each non-empty JSONL line."""
+        with open(input_path, 'rb') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if not line.endswith(b'\n'):
+                    line += b'\n'
+                key = tuple(_sort_value(record.get(field)) for field in sort_fields)
+                yield key, line
+
+    def _chunk(self, records):
+        block = []
+        for item in records:
+            block.append(item)
+            if len(block) >= self.block_records:
+                yield block
+                block = []
+        if block:
+            yield block
+
+    def _external_sort(self, records, sort_key, tmp_dir):
+        """Sort records using runs of about ``sort_memory`` bytes and a k-way merge."""
+        run_paths = []
+        run = []
+        run_bytes = 0
+        for item in records:
+            run.append(item)
+            run_bytes += len(item[-1]) + RECORD_OVERHEAD
+            if run_bytes >= self.sort_memory:
+                run_paths.append(self._write_run(run, sort_key, tmp_dir))
+                run = []
+                run_bytes = 0
+
+        if not run_paths:
+            run.sort(key=sort_key)
+            yield from run
+            return
+        if run:
+            run_paths.append(self._write_run(run, sort_key, tmp_dir))
+
+        files = [open(path, 'r', encoding='utf-8') for path in run_paths]
+        try:
+            runs = [self._read_run(f) for f in files]
+            yield from heapq.merge(*runs, key=sort_key)
+        finally:
+            for f in files:
+                f.close()
+
+    @staticmethod
+    def _write_run(run, sort_key, tmp_dir):
+        run.sort(key=sort_key)
+        fd, path = tempfile.mkstemp(suffix='.run', dir=tmp_dir)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            for key, line in run:
+                f.write(json.dumps([key, line.decode('utf-8')], ensure_ascii=False))
+                f.write('\n')
+        return path
+
+    @staticmethod
+    def _read_run(f):
+        for row in f:
+            key, line = json.loads(row)
+            yield tuple(tuple(part) for part in key), line.encode('utf-8')
+
+
+def _read_payload(path, codec, block):
+    """Read and decompress one block (zlib and zstd release the GIL)."""
+    with open(path, 'rb') as f:
+        f.seek(block['offset'])
+        data = f.read(block['length'])
+    return BlockCodec(codec).decompress(data)
+
+
+def _parse_payload(payload):
+    return [json.loads(line) for line in payload.splitlines() if line]
+
+
+def _read_records(path, codec, block):
+    """Decompress and parse one block; module-level so worker processes can run it."""
+    return _parse_payload(_read_payload(path, codec, block))
+
+
+class BlockJsonlReader:
+    """Random-access, parallel reader for a table written by BlockPacker."""
+
+    def __init__(self, packed_dir, table, workers=None, processes=False, order=None):
+        self.packed_dir = Path(packed_dir)
+        name = table if order is None else f"{table}.{order}"
+        index_paths = sorted(self.packed_dir.glob(f"{name}.jsonl.*{INDEX_SUFFIX}"))
+        if not index_paths:
+            raise FileNotFoundError(f"No packed index for '{name}' "
+                                    f"in {self.packed_dir}")
+        if len(index_paths) > 1:
+            raise ValueError(f"Multiple packed indexes for '{name}' in "
+                             f"{self.packed_dir}: {', '.join(p.name for p in index_paths)}")
+
+        with open(index_paths[0], 'r', encoding='utf-8') as f:
+            self.index = json.load(f)
+        if self.index.get('version') != INDEX_VERSION:
+            raise ValueError(f"Unsupported index version in {index_paths[0]}")
+
+        self.table = table
+        self.path = self.packed_dir / self.index['file']
+        self.codec = BlockCodec(self.index['codec'])
+        self.key = self.index['key']
+        self.blocks = self.index['blocks']
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self.processes = processes
+        self._min_keys = [_sort_value(b['min_key']) for b in self.blocks]
+        self._max_keys = [_sort_value(b['max_key']) for b in self.blocks]
+        self._alternates = {}
+
+    def __len__(self):
+        return self.index['records']
+
+    def read_block(self, block):
+        """Decompress and parse a single block."""
+        return _read_records(self.path, self.codec.codec, block)
+
+    def iter_blocks(self, blocks=None):
+        """Yield parsed blocks in file order, reading ahead in parallel.
+
+        Threads only decompress ahead; JSON parsing holds the GIL, so it runs
+        on the calling thread. With ``processes=True`` worker processes
+        decompress and parse, at the cost of pickling records back.
+        """
+        blocks = self.blocks if blocks is None else blocks
+        if self.workers <= 1:
+            for block in blocks:
+                yield self.read_block(block)
+            return
+
+        if self.processes:
+            executor_cls, task, parse = ProcessPoolExecutor, _read_records, None
+        else:
+            executor_cls, task, parse = ThreadPoolExecutor, _read_payload, _parse_payload
+
+        with executor_cls(max_workers=self.workers) as executor:
+            pending = deque()
+            for block in blocks:
+                pending.append(executor.submit(task, self.path, self.codec.codec, block))
+                if len(pending) >= self.workers * 2:
+                    result = pending.popleft().result()
+                    yield parse(result) if parse else result
+            while pending:
+                result = pending.popleft().result()
+                yield parse(result) if parse else result
+
+    def iter_records(self):
+        """Stream every record in the table."""
+        for records in self.iter_blocks():
+            yield from records
+
+    def _reader_for(self, key):
+        """Return the reader whose pack is sorted by ``key``."""
+        if key is None or key == self.key:
+            return self
+        orders = ALTERNATE_ORDERS.get(self.table, {})
+        if key not in orders:
+            raise ValueError(f"Table '{self.table}' has no index on '{key}'")
+        if key not in self._alternates:
+            self._alternates[key] = BlockJsonlReader(
+                self.packed_dir, self.table, workers=self.workers,
+                processes=self.processes, order=orders[key][0]
+            )
+        return self._alternates[key]
+
+    def blocks_for_range(self, start=None, end=None):
+        """Return the blocks that may hold sort-key values in the inclusive range."""
+        lo = None if start is None else _sort_value(start)
+        hi = None if end is None else _sort_value(end)
+
+        if self.index['sorted']:
+            first = 0 if lo is None else bisect_left(self._max_keys, lo)
+            last = len(self.blocks) if hi is None else bisect_right(self._min_keys, hi)
+            return self.blocks[first:last]
+
+        # Unsorted packs can only skip blocks whose key span misses the range
+        return [
+            block for block, min_key, max_key in
+            zip(self.blocks, self._min_keys, self._max_keys)
+            if (hi is None or min_key <= hi) and (lo is None or max_key >= lo)
+        ]
+
+    def iter_range(self, start=None, end=None, key=None):
+        """Yield records whose ``key`` lies in the inclusive range ``[start, end]``.
+
+        ``key`` defaults to the sort key; other keys (``tag_id`` for
+        ``video_tag_key``) are served from their alternate sorted copy.
+        """
+        reader = self._reader_for(key)
+        lo = None if start is None else _sort_value(start)
+        hi = None if end is None else _sort_value(end)
+        for records in reader.iter_blocks(reader.blocks_for_range(start, end)):
+            for record in records:
+                value = _sort_value(record.get(reader.key))
+                if (lo is None or value >= lo) and (hi is None or value <= hi):
+                    yield record
+
+    def lookup(self, value, key=None):
+        """Return all records whose ``key`` equals ``value``."""
+        return list(self.iter_range(value, value, key))
+
+
+def load_into_sqlite(conn, packed_dir, workers=None):
+    """Load every packed table into an SQLite connection for analysis.
+
+    A ``packed_source`` table records which pack was loaded, so a cached
+    database file is reused instead of reloaded when it already matches.
+    Databases with dataset tables but no ``packed_source`` (such as
+    youtube_2006.db) are rejected rather than overwritten.
+    """
+    readers = {table: BlockJsonlReader(packed_dir, table, workers=workers)
+               for table in TABLES}
+    source = json.dumps({
+        table: [reader.index['records'], reader.index['compressed_bytes']]
+        for table, reader in readers.items()
+    }, sort_keys=True)
+
+    existing = {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if 'packed_source' not in existing and existing & set(TABLES):
+        raise ValueError("Refusing to load packed tables into a database that already "
+                         "has dataset tables not created by load_into_sqlite")
+
+    conn.execute("CREATE TABLE IF NOT EXISTS packed_source (source TEXT)")
+    row = conn.execute("SELECT source FROM packed_source").fetchone()
+    if row is not None and row[0] == source:
+        print("✓ Reusing tables already loaded from packed files")
+        return
+
+    # Bulk load: a crash only loses the cache, which is rebuilt next run
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("DELETE FROM packed_source")
+    for table, (_, _, columns) in TABLES.items():
+        reader = readers[table]
+        column_list = ', '.join(columns)
+        placeholders = ', '.join('?' for _ in columns)
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+        conn.execute(f"CREATE TABLE {table} ({column_list})")
+
+        for records in reader.iter_blocks():
+            conn.executemany(
+                f"INSERT INTO {table} ({column_list}) VALUES ({placeholders})",
+                ([record.get(column) for column in columns] for record in records)
+            )
+        conn.commit()
+        print(f"✓ Loaded {table}: {len(reader):,} records")
+
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tags_tag_id ON tags (tag_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_vtk_vid_id ON video_tag_key (vid_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_vtk_tag_id ON video_tag_key (tag_id)")
+    conn.execute("INSERT INTO packed_source (source) VALUES (?)", (source,))
+    conn.commit()
+
+
+def _parse_key(field, value):
+    """Convert a command-line key to the type stored in the index."""
+    if value is None:
+        return None
+    return int(value) if field == 'tag_id' else value
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Pack YouTube Tagging Dataset JSONL tables into seekable '
+                    'block-compressed files'
+    )
+    parser.add_argument(
+        '--input-dir',
+        help='Directory containing videos.jsonl, tags.jsonl and video_tag_key.jsonl'
+    )
+    parser.add_argument(
+        '--output-dir',
+        default='data/packed',
+        help='Directory for packed files and indexes'
+    )
+    parser.add_argument(
+        '--codec',
+        choices=['zstd', 'gzip'],
+        default='zstd' if zstandard is not None else 'gzip',
+        help='Block compression codec (zstd requires the zstandard package)'
+    )
+    parser.add_argument(
+        '--level',
+        type=int,
+        help='Compression level (default: 10 for zstd, 6 for gzip)'
+    )
+    parser.add_argument(
+        '--block-records',
+        type=int,
+        default=50000,
+        help='Records per compressed block'
+    )
+    parser.add_argument(
+        '--no-sort',
+        action='store_true',
+        help='Keep source order instead of sorting by key (disables fast range lookups)'
+    )
+    parser.add_argument(
+        '--sort-memory',
+        type=int,
+        default=256,
+        help='Approximate memory (MB) per in-memory sort run before spilling to disk'
+    )
+    parser.add_argument(
+        '--lookup',
+        metavar='PACKED_DIR',
+        help='Query a packed directory instead of packing'
+    )
+    parser.add_argument(
+        '--table',
+        choices=sorted(TABLES),
+        help='Table to query with --lookup'
+    )
+    parser.add_argument(
+        '--by',
+        choices=['vid_id', 'tag_id'],
+        help="Field to query with --lookup (default: the table's sort key)"
+    )
+    parser.add_argument('--key', help='Exact key to look up')
+    parser.add_argument('--start', help='Inclusive range start')
+    parser.add_argument('--end', help='Inclusive range end')
+
+    args = parser.parse_args()
+
+    if args.lookup:
+        if not args.table:
+            parser.error('--lookup requires --table')
+        reader = BlockJsonlReader(args.lookup, args.table)
+        field = args.by or reader.key
+        if args.key is not None:
+            records = reader.lookup(_parse_key(field, args.key), key=field)
+        else:
+            records = reader.iter_range(_parse_key(field, args.start),
+                                        _parse_key(field, args.end), key=field)
+        for record in records:
+            print(json.dumps(record, ensure_ascii=False))
+        return
+
+    if not args.input_dir:
+        parser.error('--input-dir is required when packing')
+
+    packer = BlockPacker(
+        codec=args.codec,
+        level=args.level,
+        block_records=args.block_records,
+        sort=not args.no_sort,
+        sort_memory=args.sort_memory * 1024 * 1024
+    )
+    for table in TABLES:
+        input_path = Path(args.input_dir) / f"{table}.jsonl"
+        if not input_path.exists():
+            print(f"⚠ Skipping {table}: {input_path} not found")
+            continue
+        packer.pack_table(table, input_path, args.output_dir)
+
+    print(f"\n✓ Packed files written to: {args.output_dir}")
+
+
+if __name__ == '__main__':
+    main()